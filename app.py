@@ -1,17 +1,143 @@
+import html as html_lib
+
 import streamlit as st
 import spacy
-from spacy import displacy
-import pandas as pd
-import base64
-from io import BytesIO
-import matplotlib.pyplot as plt
-import matplotlib.colors as mcolors
-from collections import Counter
+from spacy.displacy.render import DEFAULT_LABEL_COLORS
+import numpy as np
+
+# Pipeline components the app never uses (only doc.ents is needed)
+UNUSED_PIPES = ["tagger", "parser", "attribute_ruler", "lemmatizer"]
+# Components needed to produce doc.ents
+NER_PIPES = ["tok2vec", "ner"]
 
 # Load spaCy models
 @st.cache_resource
 def load_model(model_name):
-    return spacy.load(model_name)
+    # Exclude unused components so their weights are never loaded.
+    # tok2vec is kept because NER may listen to it.
+    try:
+        return spacy.load(model_name, exclude=UNUSED_PIPES)
+    except ValueError:
+        # Older/custom model versions may not accept these names
+        return spacy.load(model_name)
+
+# Cache NER results per (model, texts) so reruns skip the pipeline.
+# Returns plain tuples rather than Docs to keep cache serialization cheap.
+# _batch_size is left out of the cache key since it doesn't change the result.
+@st.cache_data(show_spinner=False)
+def run_ner(model_name, texts, _batch_size=64):
+    nlp = load_model(model_name)
+    # Run only what NER needs. disable applies per call, so the shared cached
+    # pipeline is never modified while other sessions are using it.
+    disable = [name for name in nlp.pipe_names if name not in NER_PIPES]
+    # n_process stays at 1: forking workers inside Streamlit reloads the model
+    return [
+        [(ent.text, ent.label_, ent.start_char, ent.end_char) for ent in doc.ents]
+        for doc in nlp.pipe(texts, batch_size=_batch_size, n_process=1, disable=disable)
+    ]
+
+# Entity color mapping for visualization
+entity_colors = {
+    "PERSON": "#7aecec",
+    "ORG": "#feca74",
+    "GPE": "#ff9561",
+    "LOC": "#ff8197", 
+    "DATE": "#bfe1d9",
+    "TIME": "#bfe1d9",
+    "MONEY": "#e4e7d2",
+    "PERCENT": "#e4e7d2",
+    "WORK_OF_ART": "#f0d0ff",
+    "FAC": "#aab7d4", 
+    "PRODUCT": "#bfeeb7",
+    "EVENT": "#f89e96",
+    "LAW": "#ddd1ff",
+    "LANGUAGE": "#ff8461",
+    "QUANTITY": "#e4e7d2",
+}
+DEFAULT_COLOR = "#cccccc"
+# Integer id per known label, used for color lookups and to histogram entity counts
+LABEL_IDS = {label: i for i, label in enumerate(entity_colors)}
+# Color lookup table built once at import time, indexed by LABEL_IDS
+_color_array = np.array(list(entity_colors.values()))
+
+def lookup_colors(labels):
+    """Map entity labels to colors in one vectorized lookup."""
+    idx = np.fromiter((LABEL_IDS.get(label, -1) for label in labels), dtype=np.int64)
+    if idx.size == 0:
+        return np.array([], dtype=_color_array.dtype)
+    return np.where(idx < 0, DEFAULT_COLOR, _color_array[idx])
+
+# Highlight markup (same look as displaCy), split around the entity text and
+# preformatted per label at import time. Like displaCy, the app's colors are
+# layered over displaCy's defaults so labels such as NORP keep their color.
+_MARK_STYLE = "padding: 0.45em 0.6em; margin: 0 0.25em; line-height: 1; border-radius: 0.35em;"
+_LABEL_STYLE = ("font-size: 0.8em; font-weight: bold; line-height: 1; border-radius: 0.35em; "
+                "vertical-align: middle; margin-left: 0.5rem")
+_DEFAULT_MARK_COLOR = "#ddd"
+
+def _span_tmpl(label, color):
+    return (f'<mark class="entity" style="background: {color}; {_MARK_STYLE}">',
+            f'<span style="{_LABEL_STYLE}">{html_lib.escape(label)}</span></mark>')
+
+_HIGHLIGHT_COLORS = {**DEFAULT_LABEL_COLORS, **entity_colors}
+SPAN_TMPL = {label: _span_tmpl(label, color) for label, color in _HIGHLIGHT_COLORS.items()}
+ENTITIES_DIV = '<div class="entities" style="line-height: 2.5; direction: ltr">{content}</div>'
+
+def render_fast(text, ents):
+    """Highlight entity spans in text with one pass over the (sorted) entities."""
+    out = []
+    i = 0
+    for ent_text, label, start, end in ents:
+        out.append(html_lib.escape(text[i:start]))
+        prefix, suffix = SPAN_TMPL.get(label) or _span_tmpl(
+            label, _HIGHLIGHT_COLORS.get(label.upper(), _DEFAULT_MARK_COLOR))
+        out.append(prefix)
+        out.append(html_lib.escape(ent_text))
+        out.append(suffix)
+        i = end
+    out.append(html_lib.escape(text[i:]))
+    return "".join(out).replace("\n", "<br>")
+
+# Cache the highlight HTML for the same (model, texts) pair
+@st.cache_data(show_spinner=False)
+def render_entities(model_name, texts, _batch_size=64):
+    return "".join(
+        ENTITIES_DIV.format(content=render_fast(text, ents))
+        for text, ents in zip(texts, run_ner(model_name, texts, _batch_size))
+    )
+
+def _count_ids(ids, n):
+    out = np.zeros(n, dtype=np.int64)
+    for i in range(ids.size):
+        out[ids[i]] += 1
+    return out
+
+# Numba is optional. The kernel is compiled once per process rather than on
+# every script rerun.
+@st.cache_resource
+def histogram_kernel():
+    try:
+        from numba import njit
+    except ImportError:
+        return None
+    try:
+        return njit(cache=True)(_count_ids)
+    except RuntimeError:
+        # No writable cache directory, so compile in memory only
+        return njit(_count_ids)
+
+def count_ids(ids, n):
+    kernel = histogram_kernel()
+    if kernel is None:
+        return np.bincount(ids, minlength=n).astype(np.int64)
+    return kernel(ids, n)
+
+def label_ids(labels):
+    """Map labels to small integer ids; unknown labels get new ids after LABEL_IDS."""
+    ids = dict(LABEL_IDS)
+    codes = np.fromiter((ids.setdefault(label, len(ids)) for label in labels),
+                        dtype=np.int64, count=len(labels))
+    return codes, np.array(list(ids), dtype=object)
 
 # Initialize the app
 st.set_page_config(page_title="Named Entity Recognition System", layout="wide")
@@ -21,8 +147,13 @@ st.title("Named Entity Recognition System")
 st.sidebar.title("Controls")
 model_name = st.sidebar.selectbox(
     "Select spaCy Model",
-    ("en_core_web_sm", "en_core_web_md", "en_core_web_lg")
+    ("en_core_web_sm", "en_core_web_md", "en_core_web_lg"),
+    index=0,
 )
+if model_name == "en_core_web_lg":
+    st.sidebar.warning("en_core_web_lg uses ~750MB of memory and has slower inference.")
+split_lines = st.sidebar.checkbox("Treat each line as a separate document", value=False)
+batch_size = st.sidebar.slider("Batch size", min_value=1, max_value=256, value=64)
 
 # Try loading the model, with error handling
 try:
@@ -45,138 +176,136 @@ Named Entity Recognition (NER) is a natural language processing technique that i
 - And more...
 """)
 
-# Entity color mapping for visualization
-entity_colors = {
-    "PERSON": "#7aecec",
-    "ORG": "#feca74",
-    "GPE": "#ff9561",
-    "LOC": "#ff8197", 
-    "DATE": "#bfe1d9",
-    "TIME": "#bfe1d9",
-    "MONEY": "#e4e7d2",
-    "PERCENT": "#e4e7d2",
-    "WORK_OF_ART": "#f0d0ff",
-    "FAC": "#aab7d4", 
-    "PRODUCT": "#bfeeb7",
-    "EVENT": "#f89e96",
-    "LAW": "#ddd1ff",
-    "LANGUAGE": "#ff8461",
-    "QUANTITY": "#e4e7d2",
-}
-
 # Input text area
 st.header("Enter Text for NER Analysis")
 text_input = st.text_area("Paste your text here:", height=150, 
                           value="Apple Inc. is planning to open a new office in New York City next January. CEO Tim Cook announced this during his visit to Boston last week.")
 
+if split_lines:
+    texts = tuple(line for line in text_input.splitlines() if line.strip())
+else:
+    texts = (text_input,)
+
 # Process button
 if st.button("Analyze Text"):
     if not text_input.strip():
         st.error("Please enter some text to analyze.")
+        st.session_state.pop("ents", None)
     else:
-        doc = nlp(text_input)
-        
-        # Display results in tabs
-        tab1, tab2, tab3, tab4 = st.tabs(["Highlighted Text", "Entity List", "Entity Count", "Entity Visualization"])
+        # Process all documents in one batched pass
+        doc_entities = run_ner(model_name, texts, batch_size)
+        # Extract entity texts and labels once and share them across all tabs
+        pairs = [(text, label) for ents in doc_entities for text, label, _, _ in ents]
+        ent_texts, ent_labels = zip(*pairs) if pairs else ((), ())
+        ent_texts_arr = np.array(ent_texts, dtype=object)
+        ent_labels_arr = np.array(ent_labels, dtype=object)
         
-        with tab1:
-            st.subheader("Entities Highlighted in Text")
-            # Use spaCy's displaCy for visualization
-            html = displacy.render(doc, style="ent", options={"colors": entity_colors})
-            st.markdown(html, unsafe_allow_html=True)
+        # Build the entity highlight HTML
+        html = render_entities(model_name, texts, batch_size)
         
-        with tab2:
-            st.subheader("Extracted Entities")
-            if len(doc.ents) > 0:
-                entities_data = [(ent.text, ent.label_) for ent in doc.ents]
-                df = pd.DataFrame(entities_data, columns=["Entity", "Type"])
-                st.dataframe(df, use_container_width=True)
-                
-                # Download button for entity list
-                csv = df.to_csv(index=False)
-                b64 = base64.b64encode(csv.encode()).decode()
-                href = f'<a href="data:file/csv;base64,{b64}" download="entities.csv">Download Entity List as CSV</a>'
-                st.markdown(href, unsafe_allow_html=True)
-            else:
-                st.info("No entities were detected in the text.")
-        
-        with tab3:
-            st.subheader("Entity Count by Type")
-            if len(doc.ents) > 0:
-                entity_counts = Counter([ent.label_ for ent in doc.ents])
-                
-                # Create a bar chart
-                fig, ax = plt.subplots(figsize=(10, 6))
-                entity_types = list(entity_counts.keys())
-                counts = list(entity_counts.values())
-                
-                # Create colors list for bars
-                colors = [entity_colors.get(entity, "#cccccc") for entity in entity_types]
-                
-                bars = ax.bar(entity_types, counts, color=colors)
-                ax.set_ylabel('Count')
-                ax.set_title('Entity Counts by Type')
-                plt.xticks(rotation=45, ha="right")
-                plt.tight_layout()
-                
-                # Add count labels on top of bars
-                for bar in bars:
-                    height = bar.get_height()
-                    ax.annotate(f'{height}',
-                                xy=(bar.get_x() + bar.get_width() / 2, height),
-                                xytext=(0, 3),
-                                textcoords="offset points",
-                                ha='center', va='bottom')
-                
-                st.pyplot(fig)
-            else:
-                st.info("No entities were detected in the text.")
-        
-        with tab4:
-            st.subheader("Entity Network Visualization")
-            if len(doc.ents) > 0:
-                # Simple network visualization using matplotlib
-                st.markdown("Entity relationship visualization shows how entities appear in the document:")
-                
-                # Just displaying an entity cloud for simplicity
-                # In a more advanced implementation, you could use networkx for relationship graphs
-                entities = [ent.text for ent in doc.ents]
-                entity_types = [ent.label_ for ent in doc.ents]
-                
-                # Create a scatter plot with entity types as colors
-                fig, ax = plt.subplots(figsize=(10, 6))
-                
-                # Convert entity types to numerical values for scatter plot
-                unique_types = list(set(entity_types))
-                type_to_num = {ent_type: i for i, ent_type in enumerate(unique_types)}
-                y_values = [type_to_num[ent_type] for ent_type in entity_types]
-                
-                # Create a scatter plot
-                colors = [entity_colors.get(ent_type, "#cccccc") for ent_type in entity_types]
-                scatter = ax.scatter(range(len(entities)), y_values, c=colors, s=100)
-                
-                # Add labels
-                for i, entity in enumerate(entities):
-                    ax.annotate(entity, (i, y_values[i]), 
-                                xytext=(0, 5), textcoords='offset points',
-                                ha='center', fontsize=9)
-                
-                # Create legend
-                legend_elements = [plt.Line2D([0], [0], marker='o', color='w', 
-                                            label=ent_type, 
-                                            markerfacecolor=entity_colors.get(ent_type, "#cccccc"), 
-                                            markersize=8)
-                                for ent_type in unique_types]
-                
-                ax.legend(handles=legend_elements, title="Entity Types")
-                ax.set_yticks([])
-                ax.set_xticks([])
-                ax.set_title("Entity Visualization")
-                plt.tight_layout()
-                
-                st.pyplot(fig)
-            else:
-                st.info("No entities were detected in the text.")
+        # Keep the results across reruns so widget interactions don't re-run NER
+        st.session_state["ents"] = ((model_name, texts), ent_texts_arr, ent_labels_arr, html)
+
+# Show results for the last analyzed text
+if "ents" in st.session_state:
+    analyzed_inputs, ent_texts_arr, ent_labels_arr, html = st.session_state["ents"]
+    if analyzed_inputs != (model_name, texts):
+        st.warning("The text or model changed since the last analysis. "
+                   "Click 'Analyze Text' to update the results below.")
+    
+    # Display results in tabs
+    tab1, tab2, tab3, tab4 = st.tabs(["Highlighted Text", "Entity List", "Entity Count", "Entity Visualization"])
+    
+    with tab1:
+        st.subheader("Entities Highlighted in Text")
+        st.markdown(html, unsafe_allow_html=True)
+    
+    with tab2:
+        st.subheader("Extracted Entities")
+        if len(ent_texts_arr) > 0:
+            # Imported lazily so cold starts don't pay for modules only needed for results
+            import csv
+            from io import StringIO
+            import pyarrow as pa
+            
+            # Build the Arrow table directly; Streamlit displays Arrow without a pandas round-trip
+            table = pa.table({"Entity": ent_texts_arr, "Type": ent_labels_arr})
+            st.dataframe(table, use_container_width=True)
+            
+            # Arrow's CSV writer quotes every string, so write the CSV with the stdlib
+            # to keep the minimal quoting of the previous df.to_csv export
+            buf = StringIO()
+            writer = csv.writer(buf, lineterminator="\n")
+            writer.writerow(["Entity", "Type"])
+            writer.writerows(zip(ent_texts_arr, ent_labels_arr))
+            
+            # Download button for entity list
+            st.download_button("Download Entity List as CSV", data=buf.getvalue().encode("utf-8"),
+                               file_name="entities.csv", mime="text/csv")
+        else:
+            st.info("No entities were detected in the text.")
+    
+    with tab3:
+        st.subheader("Entity Count by Type")
+        if len(ent_texts_arr) > 0:
+            import altair as alt
+            import pandas as pd
+            
+            # Map labels to small integer ids, then histogram them in one pass
+            ids, entity_types = label_ids(ent_labels_arr)
+            counts = count_ids(ids, len(entity_types))
+            # Most frequent types first, dropping known types that didn't occur
+            order = np.argsort(-counts, kind="stable")
+            order = order[counts[order] > 0]
+            counts_df = pd.DataFrame({"Type": entity_types[order], "Count": counts[order]})
+            
+            # Bar chart rendered client-side by Vega-Lite, keeping the displaCy colors
+            color_scale = alt.Scale(
+                domain=counts_df["Type"].tolist(),
+                range=lookup_colors(counts_df["Type"]).tolist(),
+            )
+            bars = alt.Chart(counts_df, title="Entity Counts by Type").mark_bar().encode(
+                x=alt.X("Type", sort=None, axis=alt.Axis(labelAngle=-45)),
+                y="Count",
+                color=alt.Color("Type", scale=color_scale, legend=None),
+            )
+            # Count labels on top of bars
+            labels = bars.mark_text(dy=-6).encode(text="Count", color=alt.value("black"))
+            
+            st.altair_chart(bars + labels, use_container_width=True)
+        else:
+            st.info("No entities were detected in the text.")
+    
+    with tab4:
+        st.subheader("Entity Network Visualization")
+        if len(ent_texts_arr) > 0:
+            import altair as alt
+            import pandas as pd
+            
+            st.markdown("Entity relationship visualization shows how entities appear in the document:")
+            
+            # Just displaying an entity cloud for simplicity
+            # In a more advanced implementation, you could use networkx for relationship graphs
+            points_df = pd.DataFrame({
+                "Position": np.arange(len(ent_texts_arr)),
+                "Entity": ent_texts_arr,
+                "Type": ent_labels_arr,
+            })
+            unique_types = list(dict.fromkeys(ent_labels_arr))
+            color_scale = alt.Scale(domain=unique_types, range=lookup_colors(unique_types).tolist())
+            
+            # Scatter drawn client-side by Vega-Lite, with each entity's name above its point
+            scatter = alt.Chart(points_df, title="Entity Visualization").mark_circle(size=100, opacity=1).encode(
+                x=alt.X("Position", title="Position in text"),
+                y=alt.Y("Type", sort=unique_types, title=None),
+                color=alt.Color("Type", scale=color_scale, legend=alt.Legend(title="Entity Types")),
+                tooltip=["Entity", "Type"],
+            )
+            names = scatter.mark_text(dy=-10).encode(text="Entity", color=alt.value("black"))
+            
+            st.altair_chart(scatter + names, use_container_width=True)
+        else:
+            st.info("No entities were detected in the text.")
 
 # Add an explanation section for entity types
 with st.expander("Entity Types Explanation"):